@@ -11,51 +11,228 @@ to encode binary data representing the text message.
 """
 
 import numpy as np
+import os
+import shutil
+import tempfile
 import wave
 import struct
 import sys
 
+try:
+    from numba import njit, prange
+except ImportError:
+    # Numba is optional - without it the NumPy versions of the bit kernels are used
+    njit = None
 
-def text_to_binary(text):
+
+# Header stored before the message: its length in bytes as a little-endian uint32
+_HEADER_FORMAT = '<I'
+_HEADER_BITS = struct.calcsize(_HEADER_FORMAT) * 8
+
+# Number of frames copied per read/write when passing unmodified audio through
+_COPY_CHUNK_FRAMES = 65536
+
+# Sample dtypes the compiled kernels are specialized for (8, 16 and 32-bit audio)
+_NUMBA_SAMPLE_TYPES = ('uint8', 'int16', 'int32')
+
+# Multi-channel messages of at least this many bits are embedded by several
+# threads, each handling a chunk of _PARALLEL_CHUNK_BITS bits. The threshold is
+# a rough guess that has not been tuned on multi-core hardware; on a single core
+# the parallel kernel is slightly slower than the serial one
+_PARALLEL_MIN_BITS = 1 << 20
+_PARALLEL_CHUNK_BITS = 1 << 16
+
+
+def binary_to_text(binary):
     """
-    Convert text to binary string representation.
+    Convert an array of bits back to text.
     
     Args:
-        text (str): The text message to convert
+        binary (numpy.ndarray): uint8 array of 0/1 values, 8 bits per byte (MSB first)
         
     Returns:
-        str: Binary string representation of the text
+        str: The original text message
     """
-    binary = ""
-    for char in text:
-        # Convert each character to 8-bit binary
-        binary += format(ord(char), '08b')
-    return binary
+    return np.packbits(binary).tobytes().decode('utf-8', errors='replace')
 
 
-def binary_to_text(binary):
+if njit is not None:
+    @njit([f'void({t}[::1], uint8[::1], int64)' for t in _NUMBA_SAMPLE_TYPES], cache=True)
+    def _embed_lsb_serial(audio_array, bits, channels):
+        """
+        Write bits into the LSBs of the first channel of interleaved samples (in place).
+        
+        Args:
+            audio_array (numpy.ndarray): Interleaved audio samples
+            bits (numpy.ndarray): uint8 array of 0/1 values to embed
+            channels (int): Number of interleaved channels
+        """
+        for i in range(bits.size):
+            sample_index = i * channels
+            audio_array[sample_index] = (audio_array[sample_index] & ~1) | bits[i]
+
+    @njit([f'void({t}[::1], uint8[::1])' for t in _NUMBA_SAMPLE_TYPES], cache=True)
+    def _embed_lsb_mono(audio_array, bits):
+        """
+        Write bits into the LSBs of contiguous mono samples (in place).
+        
+        With unit stride LLVM vectorizes this loop (e.g. to AVX2 on x86-64),
+        widening 16 or 32 bits per instruction into sample lanes.
+        
+        Args:
+            audio_array (numpy.ndarray): Mono audio samples
+            bits (numpy.ndarray): uint8 array of 0/1 values to embed
+        """
+        for i in range(bits.size):
+            audio_array[i] = (audio_array[i] & ~1) | bits[i]
+
+    @njit([f'void({t}[::1], uint8[::1], int64)' for t in _NUMBA_SAMPLE_TYPES], cache=True, parallel=True)
+    def _embed_lsb_parallel(audio_array, bits, channels):
+        """
+        Multithreaded version of _embed_lsb_serial, splitting the bits into chunks.
+        
+        Args:
+            audio_array (numpy.ndarray): Interleaved audio samples
+            bits (numpy.ndarray): uint8 array of 0/1 values to embed
+            channels (int): Number of interleaved channels
+        """
+        chunks = (bits.size + _PARALLEL_CHUNK_BITS - 1) // _PARALLEL_CHUNK_BITS
+        for chunk in prange(chunks):
+            start = chunk * _PARALLEL_CHUNK_BITS
+            end = min(start + _PARALLEL_CHUNK_BITS, bits.size)
+            for i in range(start, end):
+                sample_index = i * channels
+                audio_array[sample_index] = (audio_array[sample_index] & ~1) | bits[i]
+
+    def _embed_lsb(audio_array, bits, channels):
+        """
+        Write bits into the LSBs of the first channel of interleaved samples (in place).
+        
+        Args:
+            audio_array (numpy.ndarray): Interleaved audio samples
+            bits (numpy.ndarray): uint8 array of 0/1 values to embed
+            channels (int): Number of interleaved channels
+            
+        Raises:
+            ValueError: If audio_array has fewer than len(bits) * channels samples
+        """
+        # The compiled kernels don't bounds-check, so a short array must never reach them
+        if audio_array.size < bits.size * channels:
+            raise ValueError(f"{bits.size} bits need {bits.size * channels} samples, got {audio_array.size}")
+        
+        # Only mono gets its own kernel: a unit stride lets the loop vectorize.
+        # Baking larger strides in as compile-time constants measured no faster
+        # than passing channels at runtime, so those share one kernel.
+        if channels == 1:
+            _embed_lsb_mono(audio_array, bits)
+        elif bits.size >= _PARALLEL_MIN_BITS:
+            _embed_lsb_parallel(audio_array, bits, channels)
+        else:
+            _embed_lsb_serial(audio_array, bits, channels)
+
+    @njit([f'uint8[::1]({t}[::1], int64)' for t in _NUMBA_SAMPLE_TYPES], cache=True)
+    def _extract_lsb(audio_array, channels):
+        """
+        Read the LSBs of the first channel of interleaved samples.
+        
+        Args:
+            audio_array (numpy.ndarray): Interleaved audio samples
+            channels (int): Number of interleaved channels
+            
+        Returns:
+            numpy.ndarray: uint8 array of 0/1 values, one per frame
+        """
+        samples_per_channel = audio_array.size // channels
+        out = np.empty(samples_per_channel, np.uint8)
+        for i in range(samples_per_channel):
+            out[i] = audio_array[i * channels] & 1
+        return out
+else:
+    def _embed_lsb(audio_array, bits, channels):
+        """
+        Write bits into the LSBs of the first channel of interleaved samples (in place).
+        
+        Args:
+            audio_array (numpy.ndarray): Interleaved audio samples
+            bits (numpy.ndarray): uint8 array of 0/1 values to embed
+            channels (int): Number of interleaved channels
+            
+        Raises:
+            ValueError: If audio_array has fewer than len(bits) * channels samples
+        """
+        if audio_array.size < bits.size * channels:
+            raise ValueError(f"{bits.size} bits need {bits.size * channels} samples, got {audio_array.size}")
+        
+        # View the interleaved samples as (frames, channels); column 0 is the
+        # first channel and writes to it land in audio_array. For mono audio this
+        # is a unit-stride view, which NumPy's AND/OR loops already vectorize
+        first_channel = audio_array.reshape(-1, channels)[:len(bits), 0]
+        # ~1 clears only the LSB; in two's complement this is also correct for
+        # signed samples, so a single mask works for every sample width
+        lsb_mask = ~audio_array.dtype.type(1)
+        # In-place operators on the view avoid gather/scatter temporaries
+        first_channel &= lsb_mask
+        first_channel |= bits
+
+    def _extract_lsb(audio_array, channels):
+        """
+        Read the LSBs of the first channel of interleaved samples.
+        
+        Args:
+            audio_array (numpy.ndarray): Interleaved audio samples
+            channels (int): Number of interleaved channels
+            
+        Returns:
+            numpy.ndarray: uint8 array of 0/1 values, one per frame
+        """
+        first_channel = audio_array.reshape(-1, channels)[:, 0]
+        # Mask straight into a preallocated uint8 array instead of allocating a
+        # full-width temporary and converting it
+        out = np.empty(len(first_channel), dtype=np.uint8)
+        np.bitwise_and(first_channel, 1, out=out, casting='unsafe')
+        return out
+
+
+def _read_samples(audio_file, frames):
     """
-    Convert binary string back to text.
+    Read frames from an open WAV file into a writable array of samples.
     
     Args:
-        binary (str): Binary string representation
+        audio_file (wave.Wave_read): WAV file opened for reading
+        frames (int): Number of frames to read from the current position
         
     Returns:
-        str: The original text message
+        numpy.ndarray: Interleaved audio samples, or None if the sample width is unsupported
     """
-    text = ""
-    # Process 8 bits at a time
-    for i in range(0, len(binary), 8):
-        byte = binary[i:i+8]
-        if len(byte) == 8:
-            text += chr(int(byte, 2))
-    return text
+    sample_width = audio_file.getsampwidth()
+    audio_data = audio_file.readframes(frames)
+    
+    if sample_width == 1:
+        # 8-bit audio
+        dtype = np.uint8
+    elif sample_width == 2:
+        # 16-bit audio - keep as int16 and work with raw bytes
+        dtype = np.int16
+    elif sample_width == 4:
+        # 32-bit audio
+        dtype = np.int32
+    else:
+        return None
+        
+    # frombuffer gives a read-only view of the bytes; copy it into a writable,
+    # aligned, C-contiguous array so the bit kernels always get unit-stride memory
+    return np.require(np.frombuffer(audio_data, dtype=dtype), requirements=['C', 'A', 'W'])
 
 
 def embed_message(input_wav, output_wav, message):
     """
     Embed a text message into an audio file using LSB steganography.
     
+    Only the frames that carry the message are decoded and modified; the rest
+    of the audio is copied to the output in chunks. output_wav may be the same
+    file as input_wav: the output is then written to a temporary file and moved
+    into place at the end.
+    
     Args:
         input_wav (str): Path to the input WAV file
         output_wav (str): Path to save the watermarked WAV file
@@ -64,89 +241,70 @@ def embed_message(input_wav, output_wav, message):
     Returns:
         bool: True if successful, False otherwise
     """
+    temp_wav = None
     try:
         # Read the input WAV file
         with wave.open(input_wav, 'rb') as audio_file:
             # Get audio parameters
             frames = audio_file.getnframes()
-            sample_rate = audio_file.getframerate()
             channels = audio_file.getnchannels()
             sample_width = audio_file.getsampwidth()
             
-            # Read all audio data
-            audio_data = audio_file.readframes(frames)
+            # Prefix a header holding the message length so extraction knows where it ends
+            message_bytes = message.encode('utf-8')
+            payload = struct.pack(_HEADER_FORMAT, len(message_bytes)) + message_bytes
             
-        # Convert audio data to numpy array for easier manipulation
-        if sample_width == 1:
-            # 8-bit audio
-            audio_array = np.frombuffer(audio_data, dtype=np.uint8).copy()
-        elif sample_width == 2:
-            # 16-bit audio - keep as int16 and work with raw bytes
-            audio_array = np.frombuffer(audio_data, dtype=np.int16).copy()
-        elif sample_width == 4:
-            # 32-bit audio
-            audio_array = np.frombuffer(audio_data, dtype=np.int32).copy()
-        else:
-            print(f"Unsupported sample width: {sample_width}")
-            return False
+            # Convert the payload to an array of bits (8 per byte, MSB first)
+            bits = np.unpackbits(np.frombuffer(payload, dtype=np.uint8))
             
-        # Convert message to binary
-        message_binary = text_to_binary(message)
-        
-        # Add a delimiter to mark the end of the message (16 zeros)
-        message_binary += "0000000000000000"
-        
-        # For multi-channel audio, only embed in the first channel
-        samples_per_channel = len(audio_array) // channels
-        if len(message_binary) > samples_per_channel:
-            print("Error: Message too long for the audio file")
-            return False
+            # For multi-channel audio, only embed in the first channel
+            if len(bits) > frames:
+                print("Error: Message too long for the audio file")
+                return False
+                
+            # Read only the frames the message is embedded in
+            audio_array = _read_samples(audio_file, len(bits))
+            if audio_array is None:
+                print(f"Unsupported sample width: {sample_width}")
+                return False
+            # A truncated file can hold fewer frames than its header claims
+            if audio_array.size != len(bits) * channels:
+                print("Error: Message too long for the audio file")
+                return False
+                
+            # Embed the message using LSB modification (only in first channel)
+            assert audio_array.flags['C_CONTIGUOUS']
+            _embed_lsb(audio_array, bits, channels)
             
-        # Embed the message using LSB modification (only in first channel)
-        for i, bit in enumerate(message_binary):
-            # Only modify samples from the first channel
-            sample_index = i * channels
-            if sample_index < len(audio_array):
-                # Modify the least significant bit of each audio sample
-                if sample_width == 1:
-                    # For 8-bit audio
-                    audio_array[sample_index] = (audio_array[sample_index] & 0xFE) | int(bit)
-                elif sample_width == 2:
-                    # For 16-bit audio - use numpy's view to handle signed/unsigned conversion
-                    current_val = audio_array[sample_index]
-                    # Convert to unsigned for bit manipulation
-                    unsigned_val = current_val.astype(np.uint16)
-                    if int(bit) == 0:
-                        # Set LSB to 0
-                        new_unsigned = unsigned_val & 0xFFFE
-                    else:
-                        # Set LSB to 1
-                        new_unsigned = unsigned_val | 0x0001
+            # The input is still being read from, so when embedding in place write
+            # to a temporary file in the same directory and replace the input later
+            write_wav = output_wav
+            if os.path.exists(output_wav) and os.path.samefile(input_wav, output_wav):
+                fd, temp_wav = tempfile.mkstemp(suffix='.wav', dir=os.path.dirname(os.path.abspath(output_wav)))
+                os.close(fd)
+                write_wav = temp_wav
+            
+            # The header already carries the final frame count (from setparams),
+            # so writeframesraw is enough and the header is only patched on close
+            # if it is off
+            with wave.open(write_wav, 'wb') as output_file:
+                output_file.setparams(audio_file.getparams())
+                # audio_array already has the file's sample dtype, so its buffer
+                # can be written directly without a tobytes() copy
+                output_file.writeframesraw(memoryview(audio_array).cast('B'))
+                
+                # Copy the remaining, unmodified frames as raw bytes
+                while True:
+                    chunk = audio_file.readframes(_COPY_CHUNK_FRAMES)
+                    if not chunk:
+                        break
+                    output_file.writeframesraw(chunk)
                     
-                    # Convert back to signed int16 using numpy
-                    audio_array[sample_index] = new_unsigned.astype(np.int16)
-                elif sample_width == 4:
-                    # For 32-bit audio
-                    audio_array[sample_index] = (audio_array[sample_index] & 0xFFFFFFFE) | int(bit)
-            else:
-                print(f"Warning: Not enough samples to embed bit {i}")
-                break
-        
-        # Convert back to bytes
-        if sample_width == 1:
-            watermarked_data = audio_array.astype(np.uint8).tobytes()
-        elif sample_width == 2:
-            # Keep as int16
-            watermarked_data = audio_array.astype(np.int16).tobytes()
-        elif sample_width == 4:
-            watermarked_data = audio_array.astype(np.int32).tobytes()
-        
-        # Write the watermarked audio to output file
-        with wave.open(output_wav, 'wb') as output_file:
-            output_file.setnchannels(channels)
-            output_file.setsampwidth(sample_width)
-            output_file.setframerate(sample_rate)
-            output_file.writeframes(watermarked_data)
+        if temp_wav is not None:
+            # Keep the permission bits of the file being replaced
+            shutil.copymode(output_wav, temp_wav)
+            os.replace(temp_wav, output_wav)
+            temp_wav = None
             
         print(f"Message successfully embedded in {output_wav}")
         return True
@@ -154,12 +312,19 @@ def embed_message(input_wav, output_wav, message):
     except Exception as e:
         print(f"Error embedding message: {e}")
         return False
+        
+    finally:
+        # Don't leave a partial output behind if anything failed
+        if temp_wav is not None:
+            os.remove(temp_wav)
 
 
 def extract_message(watermarked_wav):
     """
     Extract a hidden text message from a watermarked audio file.
     
+    Only the header and the frames that carry the message are read.
+    
     Args:
         watermarked_wav (str): Path to the watermarked WAV file
         
@@ -174,64 +339,36 @@ def extract_message(watermarked_wav):
             sample_width = audio_file.getsampwidth()
             channels = audio_file.getnchannels()
             
-            # Read all audio data
-            audio_data = audio_file.readframes(frames)
-            
-        # Convert audio data to numpy array
-        if sample_width == 1:
-            # 8-bit audio
-            audio_array = np.frombuffer(audio_data, dtype=np.uint8).copy()
-        elif sample_width == 2:
-            # 16-bit audio - use int16 to match embedding
-            audio_array = np.frombuffer(audio_data, dtype=np.int16).copy()
-        elif sample_width == 4:
-            # 32-bit audio
-            audio_array = np.frombuffer(audio_data, dtype=np.int32).copy()
-        else:
-            print(f"Unsupported sample width: {sample_width}")
-            return ""
+            if frames < _HEADER_BITS:
+                print("Error: Audio file too short to contain a message")
+                return ""
+                
+            # Read the message length from the header
+            header_array = _read_samples(audio_file, _HEADER_BITS)
+            if header_array is None:
+                print(f"Unsupported sample width: {sample_width}")
+                return ""
+            # A truncated file can hold fewer frames than its header claims
+            if header_array.size != _HEADER_BITS * channels:
+                print("Error: Audio file too short to contain a message")
+                return ""
+            header = np.packbits(_extract_lsb(header_array, channels)).tobytes()
+            message_length, = struct.unpack(_HEADER_FORMAT, header)
+            if _HEADER_BITS + message_length * 8 > frames:
+                print(f"Error: Invalid message length: {message_length} bytes")
+                return ""
+                
+            # Read only the frames the message is embedded in
+            audio_array = _read_samples(audio_file, message_length * 8)
+            if audio_array.size != message_length * 8 * channels:
+                print(f"Error: Invalid message length: {message_length} bytes")
+                return ""
             
         # Extract LSBs from audio samples (only from first channel)
-        binary_message = ""
-        samples_per_channel = len(audio_array) // channels
+        lsbs = _extract_lsb(audio_array, channels)
         
-        # Extract bits until we find the delimiter
-        # We'll extract from all available samples in the first channel
-        for i in range(samples_per_channel):
-            # Only extract from the first channel
-            sample_index = i * channels
-            if sample_index < len(audio_array):
-                sample = audio_array[sample_index]
-                # Extract the least significant bit
-                bit = sample & 0x01
-                binary_message += str(bit)
-                
-                # Check for delimiter (16 consecutive zeros) - but only after we have enough bits
-                if len(binary_message) >= 16:
-                    # Look for the delimiter pattern
-                    last_16 = binary_message[-16:]
-                    if last_16 == "0000000000000000":
-                        # Remove the delimiter
-                        binary_message = binary_message[:-16]
-                        break
-            else:
-                break
-        
-        # If we didn't find the delimiter, try to find a valid 8-bit boundary
-        if len(binary_message) % 8 != 0:
-            # Try to find a valid 8-bit boundary by removing extra bits
-            for i in range(8):
-                if (len(binary_message) - i) % 8 == 0:
-                    binary_message = binary_message[:len(binary_message) - i]
-                    break
-                
         # Convert binary back to text
-        if len(binary_message) % 8 != 0:
-            print(f"Error: Invalid binary data length: {len(binary_message)}")
-            print(f"Binary data: {binary_message}")
-            return ""
-            
-        message = binary_to_text(binary_message)
+        message = binary_to_text(lsbs)
         return message
         
     except Exception as e:
@@ -252,7 +389,8 @@ def main():
     message = "Hi I Mahdi, It is a secret message!"
     
     print(f"Original message: {message}")
-    print(f"Message length: {len(message)} characters ({len(message) * 8} bits)")
+    payload_bits = _HEADER_BITS + len(message.encode('utf-8')) * 8
+    print(f"Message length: {len(message)} characters ({payload_bits} bits embedded, including the length header)")
     print(f"Input file: {input_file}")
     print(f"Output file: {output_file}")
     
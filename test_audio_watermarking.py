@@ -0,0 +1,178 @@
+"""
+Round-trip tests for audio_watermarking, run with and without Numba.
+"""
+
+import importlib
+import sys
+import wave
+
+import numpy as np
+import pytest
+
+import audio_watermarking
+
+
+SAMPLE_DTYPES = {1: np.uint8, 2: np.int16, 4: np.int32}
+
+
+@pytest.fixture(params=['numba', 'numpy'])
+def aw(request, monkeypatch):
+    """
+    The audio_watermarking module, reloaded with or without Numba so both the
+    compiled kernels and the NumPy fallback get exercised.
+    """
+    if request.param == 'numba':
+        pytest.importorskip('numba')
+    else:
+        monkeypatch.setitem(sys.modules, 'numba', None)
+    module = importlib.reload(audio_watermarking)
+    assert (module.njit is None) == (request.param == 'numpy')
+    return module
+
+
+def write_wav(path, sample_width, channels, frames, seed=0):
+    """
+    Write a WAV file of random samples and return the samples.
+    """
+    dtype = SAMPLE_DTYPES[sample_width]
+    info = np.iinfo(dtype)
+    rng = np.random.default_rng(seed)
+    samples = rng.integers(info.min, info.max, size=frames * channels, dtype=dtype, endpoint=True)
+    with wave.open(str(path), 'wb') as wav_file:
+        wav_file.setnchannels(channels)
+        wav_file.setsampwidth(sample_width)
+        wav_file.setframerate(8000)
+        wav_file.writeframes(samples.tobytes())
+    return samples
+
+
+def read_wav(path):
+    """
+    Read a WAV file back as (params, samples).
+    """
+    with wave.open(str(path), 'rb') as wav_file:
+        params = wav_file.getparams()
+        samples = np.frombuffer(wav_file.readframes(params.nframes), dtype=SAMPLE_DTYPES[params.sampwidth])
+    return params, samples
+
+
+@pytest.mark.parametrize('sample_width', [1, 2, 4])
+@pytest.mark.parametrize('channels', [1, 2])
+@pytest.mark.parametrize('message', ['', 'Hi!', 'ends with @', 'héllo wörld ✓'])
+def test_round_trip(aw, tmp_path, sample_width, channels, message):
+    input_wav = tmp_path / 'input.wav'
+    output_wav = tmp_path / 'output.wav'
+    original = write_wav(input_wav, sample_width, channels, frames=2000)
+
+    assert aw.embed_message(str(input_wav), str(output_wav), message)
+    assert aw.extract_message(str(output_wav)) == message
+
+    params, watermarked = read_wav(output_wav)
+    assert (params.nchannels, params.sampwidth, params.nframes) == (channels, sample_width, 2000)
+    # Only the LSBs of the first channel may change
+    lsb_mask = ~SAMPLE_DTYPES[sample_width](1)
+    assert not np.any((watermarked ^ original) & lsb_mask)
+    assert np.array_equal(watermarked.reshape(-1, channels)[:, 1:], original.reshape(-1, channels)[:, 1:])
+
+
+def test_message_too_long(aw, tmp_path):
+    input_wav = tmp_path / 'input.wav'
+    output_wav = tmp_path / 'output.wav'
+    write_wav(input_wav, 2, 1, frames=100)
+
+    assert not aw.embed_message(str(input_wav), str(output_wav), 'far too long for 100 frames')
+    assert not output_wav.exists()
+
+
+def truncate_wav(path, frames, sample_width, channels):
+    """
+    Cut a WAV file's data after the given number of frames, leaving its header
+    (and so getnframes()) claiming the original length.
+    """
+    with open(path, 'r+b') as wav_file:
+        wav_file.truncate(44 + frames * sample_width * channels)
+
+
+@pytest.mark.parametrize('sample_width', [1, 2, 4])
+@pytest.mark.parametrize('channels', [1, 2])
+def test_embed_into_truncated_file(aw, tmp_path, sample_width, channels):
+    input_wav = tmp_path / 'input.wav'
+    output_wav = tmp_path / 'output.wav'
+    write_wav(input_wav, sample_width, channels, frames=2000)
+    truncate_wav(input_wav, 50, sample_width, channels)
+
+    assert not aw.embed_message(str(input_wav), str(output_wav), 'longer than fifty frames')
+
+
+@pytest.mark.parametrize('kept_frames', [10, 60])
+def test_extract_from_truncated_file(aw, tmp_path, kept_frames):
+    input_wav = tmp_path / 'input.wav'
+    output_wav = tmp_path / 'output.wav'
+    write_wav(input_wav, 2, 2, frames=2000)
+    assert aw.embed_message(str(input_wav), str(output_wav), 'a message of 13 bytes'[:13])
+    # 10 frames cut into the header, 60 into the message
+    truncate_wav(output_wav, kept_frames, 2, 2)
+
+    assert aw.extract_message(str(output_wav)) == ""
+
+
+def test_embed_in_place(aw, tmp_path):
+    wav_path = tmp_path / 'audio.wav'
+    original = write_wav(wav_path, 2, 2, frames=2000)
+
+    assert aw.embed_message(str(wav_path), str(wav_path), 'hello')
+    assert aw.extract_message(str(wav_path)) == 'hello'
+
+    params, watermarked = read_wav(wav_path)
+    assert params.nframes == 2000
+    assert not np.any((watermarked ^ original) & ~np.int16(1))
+    # No temporary files are left next to the output
+    assert [path.name for path in tmp_path.iterdir()] == ['audio.wav']
+
+
+@pytest.mark.parametrize('channels', [1, 2])
+def test_embed_lsb_rejects_short_array(aw, channels):
+    audio_array = np.zeros(10 * channels - 1, dtype=np.int16)
+    bits = np.ones(10, dtype=np.uint8)
+
+    with pytest.raises(ValueError):
+        aw._embed_lsb(audio_array, bits, channels)
+
+
+def test_embed_from_read_only_input(aw, tmp_path):
+    input_wav = tmp_path / 'input.wav'
+    output_wav = tmp_path / 'output.wav'
+    write_wav(input_wav, 2, 1, frames=2000)
+    input_wav.chmod(0o444)
+
+    assert aw.embed_message(str(input_wav), str(output_wav), 'hi')
+    assert aw.extract_message(str(output_wav)) == 'hi'
+    # The output must not inherit the input's read-only mode
+    assert output_wav.stat().st_mode & 0o200
+
+
+def test_embed_in_place_keeps_mode(aw, tmp_path):
+    wav_path = tmp_path / 'audio.wav'
+    write_wav(wav_path, 2, 1, frames=2000)
+    wav_path.chmod(0o640)
+
+    assert aw.embed_message(str(wav_path), str(wav_path), 'hi')
+    assert wav_path.stat().st_mode & 0o777 == 0o640
+
+
+def test_parallel_kernel_matches_serial(aw):
+    if aw.njit is None:
+        pytest.skip('the parallel kernel needs Numba')
+    rng = np.random.default_rng(0)
+    # Not a multiple of the chunk size, so the last chunk is partial
+    bit_count = 3 * aw._PARALLEL_CHUNK_BITS + 123
+    channels = 2
+    audio_array = rng.integers(-32768, 32767, size=(bit_count + 10) * channels, dtype=np.int16, endpoint=True)
+    bits = rng.integers(0, 2, size=bit_count, dtype=np.uint8)
+    expected = audio_array.copy()
+
+    aw._embed_lsb_parallel(audio_array, bits, channels)
+    aw._embed_lsb_serial(expected, bits, channels)
+
+    assert np.array_equal(audio_array, expected)
+    assert np.array_equal(audio_array[:bit_count * channels:channels] & 1, bits)